@@ -7,17 +7,26 @@ and generates time-series graphs using Python's Matplotlib.
 
 from flask import Flask, request, jsonify, render_template, send_from_directory, abort
 from flask_sqlalchemy import SQLAlchemy
-from datetime import datetime, timedelta
+from sqlalchemy import func
+from datetime import datetime
 import os
+import atexit
 from dotenv import load_dotenv
-from functools import wraps
+from functools import wraps, lru_cache
 import base64
 import secrets
+import hmac
 import logging
-from logging.handlers import RotatingFileHandler
+from logging.handlers import RotatingFileHandler, QueueHandler, QueueListener
 import time
+import queue
+from collections import OrderedDict
+import threading
+from threading import Lock
 import re
 import ipaddress
+from bisect import bisect_right
+import orjson
 
 # Import the graph manager after it's been created
 from graph_manager import GraphManager
@@ -30,13 +39,50 @@ log_dir = os.environ.get('LOG_DIR', 'logs')
 os.makedirs(log_dir, exist_ok=True)
 log_file = os.path.join(log_dir, 'app.log')
 
+class SizeRotatingFileHandler(RotatingFileHandler):
+    """
+    RotatingFileHandler that decides on rollover from the stream position alone.
+    
+    The stock shouldRollover() also stats the log file on every record; the
+    log file here is always a regular file, so that check is skipped.
+    """
+    def shouldRollover(self, record):
+        if self.stream is None:
+            self.stream = self._open()
+        if self.maxBytes > 0:
+            msg = "%s\n" % self.format(record)
+            if self.stream.tell() + len(msg) >= self.maxBytes:
+                return 1
+        return 0
+
 # Configure the logger
 logger = logging.getLogger('sensor_api')
 logger.setLevel(logging.INFO)
-handler = RotatingFileHandler(log_file, maxBytes=10485760, backupCount=5)
+handler = SizeRotatingFileHandler(log_file, maxBytes=10485760, backupCount=5)
 formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
 handler.setFormatter(formatter)
-logger.addHandler(handler)
+
+# Request threads only enqueue records; a listener thread writes them to the file
+log_queue = queue.Queue(-1)
+log_listener = QueueListener(log_queue, handler)
+log_listener.start()
+atexit.register(log_listener.stop)
+queue_handler = QueueHandler(log_queue)
+logger.addHandler(queue_handler)
+
+def restart_log_listener():
+    """Give a forked worker its own log queue and listener thread."""
+    global log_queue, log_listener
+    atexit.unregister(log_listener.stop)
+    log_queue = queue.Queue(-1)
+    queue_handler.queue = log_queue
+    log_listener = QueueListener(log_queue, handler)
+    log_listener.start()
+    atexit.register(log_listener.stop)
+
+# With gunicorn's preload_app the app is imported once and then forked, and
+# threads do not survive a fork
+os.register_at_fork(after_in_child=restart_log_listener)
 
 # Authentication configuration
 API_USERNAME = os.environ.get('API_USERNAME')
@@ -46,10 +92,22 @@ API_PASSWORD = os.environ.get('API_PASSWORD')
 if not API_USERNAME or not API_PASSWORD or API_PASSWORD == 'change_this_password':
     logger.warning("Warning: Using default or empty API credentials. This is insecure!")
 
+# Credentials encoded once for constant-time comparison
+API_USERNAME_BYTES = (API_USERNAME or '').encode('utf-8')
+API_PASSWORD_BYTES = (API_PASSWORD or '').encode('utf-8')
+
 # Rate limiting configuration
 RATE_LIMIT_WINDOW = int(os.environ.get('RATE_LIMIT_WINDOW', 60))  # seconds
 MAX_REQUESTS = int(os.environ.get('MAX_REQUESTS', 10))  # max requests per window
-request_history = {}  # IP address -> list of timestamps
+MAX_IPS = int(os.environ.get('MAX_IPS', 16384))  # max IPs tracked at once
+
+# Request history is split into shards, each guarded by its own lock, so
+# concurrent requests from different IPs rarely contend with each other.
+# Each shard maps IP address -> (tokens, last_refill) token bucket, in LRU order.
+RATE_LIMIT_SHARDS = 32  # must be a power of two
+MAX_IPS_PER_SHARD = max(1, MAX_IPS // RATE_LIMIT_SHARDS)
+REFILL_RATE = MAX_REQUESTS / RATE_LIMIT_WINDOW  # tokens regained per second
+request_history = [(Lock(), OrderedDict()) for _ in range(RATE_LIMIT_SHARDS)]
 
 # Allowed IP ranges (optional)
 allowed_ips_str = os.environ.get('ALLOWED_IPS', '')
@@ -61,6 +119,44 @@ if allowed_ips_str:
         except ValueError as e:
             logger.error(f"Invalid IP range: {ip_range} - {str(e)}")
 
+def build_ip_intervals(networks):
+    """
+    Merge networks into sorted, non-overlapping integer intervals for binary search.
+    
+    Returns a dict mapping IP version -> (starts, ends) lists.
+    """
+    intervals = {4: [], 6: []}
+    for network in sorted(networks, key=lambda n: (n.version, int(n.network_address))):
+        start, end = int(network.network_address), int(network.broadcast_address)
+        merged = intervals[network.version]
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return {version: ([s for s, _ in merged], [e for _, e in merged])
+            for version, merged in intervals.items()}
+
+allowed_ip_intervals = build_ip_intervals(allowed_ip_ranges)
+
+# Time periods accepted by /readings/<period>, in hours
+READING_PERIODS = {
+    'hour': 1,
+    'day': 24,
+    'week': 168,
+    'month': 720
+}
+READING_PERIOD_NAMES = ", ".join(READING_PERIODS)
+
+# Upper bound on rows returned by a single period query
+MAX_ROWS = int(os.environ.get('MAX_ROWS', 10000))
+
+# Upper bound on rows loaded for the graphs; dense periods are downsampled when
+# plotted, so this only guards memory and covers a month at several readings a minute
+MAX_GRAPH_ROWS = int(os.environ.get('MAX_GRAPH_ROWS', 200000))
+
+# Upper bound on readings accepted by a single /measure/bulk request
+MAX_BULK_READINGS = int(os.environ.get('MAX_BULK_READINGS', 1000))
+
 app = Flask(__name__)
 
 # Database configuration with timeout and connection pooling
@@ -79,6 +175,10 @@ app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
 app.config['SQLALCHEMY_ENGINE_OPTIONS'] = {
     'pool_recycle': 280,  # recycle connections before MySQL default timeout
     'pool_pre_ping': True,  # verify connection is active before using
+    'pool_size': int(os.environ.get('DB_POOL_SIZE', 20)),  # persistent connections per worker
+    'max_overflow': int(os.environ.get('DB_MAX_OVERFLOW', 40)),  # extra connections under bursts
+    'pool_timeout': 10,  # seconds to wait for a free connection
+    'pool_use_lifo': True,  # reuse the most recently returned (warm) connection first
     'connect_args': {'connect_timeout': 10}  # connection timeout in seconds
 }
 
@@ -87,72 +187,105 @@ db = SQLAlchemy(app)
 
 # Initialize Graph manager
 graph_dir = os.environ.get('GRAPH_DIR', 'static/graph')
-graph_manager = GraphManager(graph_dir=graph_dir)
+graph_refresh_interval = float(os.environ.get('GRAPH_REFRESH_INTERVAL', 10))  # seconds
+graph_manager = GraphManager(graph_dir=graph_dir, refresh_interval=graph_refresh_interval)
+graph_page_cache = {}  # 'page' -> (graph version, rendered /graph HTML)
+
+# Allowed graph filenames (prevents directory traversal)
+GRAPH_FILENAME_RE = re.compile(r'^[a-zA-Z0-9_\-]+\.(?:png|jpe?g|gif)\Z')
 
 # IP address restriction
+@lru_cache(maxsize=4096)
+def parse_ip(ip_addr):
+    """Parse an IP address string, caching the result for repeat clients."""
+    return ipaddress.ip_address(ip_addr)
+
 def check_ip_allowed(ip_addr):
     """Check if an IP address is allowed based on configured ranges."""
     if not allowed_ip_ranges:
         return True  # No restrictions if no ranges defined
     
     try:
-        ip = ipaddress.ip_address(ip_addr)
-        for allowed_range in allowed_ip_ranges:
-            if ip in allowed_range:
-                return True
-        return False
+        ip = parse_ip(ip_addr)
     except ValueError:
         return False  # Invalid IP address format
+    
+    # Find the last interval starting at or below the address
+    ip_int = int(ip)
+    starts, ends = allowed_ip_intervals[ip.version]
+    i = bisect_right(starts, ip_int) - 1
+    return i >= 0 and ends[i] >= ip_int
 
 # Rate limiting function
 def is_rate_limited(ip_addr):
     """Check if an IP is being rate limited due to too many requests."""
-    now = time.time()
+    lock, shard = request_history[hash(ip_addr) & (RATE_LIMIT_SHARDS - 1)]
     
-    # Initialize or clean up old requests for this IP
-    if ip_addr not in request_history:
-        request_history[ip_addr] = []
-    else:
-        # Remove timestamps older than the window
-        request_history[ip_addr] = [t for t in request_history[ip_addr] 
-                                   if now - t < RATE_LIMIT_WINDOW]
+    with lock:
+        now = time.time()
+        
+        # New IPs start with a full bucket, otherwise mark the IP as recently used
+        bucket = shard.get(ip_addr)
+        if bucket is None:
+            tokens = MAX_REQUESTS
+        else:
+            shard.move_to_end(ip_addr)
+            
+            # Refill the tokens earned since the last request
+            tokens = min(MAX_REQUESTS, bucket[0] + (now - bucket[1]) * REFILL_RATE)
+            
+        # Check if too many requests
+        if tokens < 1:
+            return True
+        
+        # Record this request
+        shard[ip_addr] = (tokens - 1, now)
+        
+        # Evict the least recently seen IP so memory stays bounded
+        if len(shard) > MAX_IPS_PER_SHARD:
+            shard.popitem(last=False)
+        return False
+
+# Request gate
+def check_request(ip_addr, auth):
+    """
+    Run the IP restriction, rate limit and credential checks for a request.
+    
+    Returns an error response tuple, or None if the request may proceed.
+    """
+    # Check if IP is allowed (if restriction is enabled)
+    if allowed_ip_ranges and not check_ip_allowed(ip_addr):
+        logger.warning(f"Blocked request from unauthorized IP: {ip_addr}")
+        return jsonify({'error': 'Access denied'}), 403
+    
+    # Check rate limiting
+    if is_rate_limited(ip_addr):
+        logger.warning(f"Rate limited request from IP: {ip_addr}")
+        return jsonify({'error': 'Too many requests'}), 429
+    
+    # Check authentication, comparing both fields in constant time
+    # without short-circuiting on the username
+    if auth and API_USERNAME and API_PASSWORD:
+        username_ok = hmac.compare_digest((auth.username or '').encode('utf-8'), API_USERNAME_BYTES)
+        password_ok = hmac.compare_digest((auth.password or '').encode('utf-8'), API_PASSWORD_BYTES)
+        if username_ok and password_ok:
+            return None
     
-    # Check if too many requests
-    if len(request_history[ip_addr]) >= MAX_REQUESTS:
-        return True
+    # Log failed authentication attempt
+    logger.warning(f"Failed authentication attempt from {ip_addr}")
     
-    # Record this request
-    request_history[ip_addr].append(now)
-    return False
+    # Return 401 Unauthorized with WWW-Authenticate header
+    return jsonify({'error': 'Authentication required'}), 401, {
+        'WWW-Authenticate': 'Basic realm="Sensor API"'
+    }
 
 # Authentication decorator
 def requires_auth(f):
     @wraps(f)
     def decorated(*args, **kwargs):
-        # Get client IP address
-        ip_addr = request.remote_addr
-        
-        # Check if IP is allowed (if restriction is enabled)
-        if not check_ip_allowed(ip_addr):
-            logger.warning(f"Blocked request from unauthorized IP: {ip_addr}")
-            return jsonify({'error': 'Access denied'}), 403
-        
-        # Check rate limiting
-        if is_rate_limited(ip_addr):
-            logger.warning(f"Rate limited request from IP: {ip_addr}")
-            return jsonify({'error': 'Too many requests'}), 429
-            
-        # Check authentication
-        auth = request.authorization
-        
-        if not auth or auth.username != API_USERNAME or auth.password != API_PASSWORD:
-            # Log failed authentication attempt
-            logger.warning(f"Failed authentication attempt from {ip_addr}")
-            
-            # Return 401 Unauthorized with WWW-Authenticate header
-            return jsonify({'error': 'Authentication required'}), 401, {
-                'WWW-Authenticate': 'Basic realm="Sensor API"'
-            }
+        error = check_request(request.remote_addr, request.authorization)
+        if error is not None:
+            return error
         
         # Authentication successful
         return f(*args, **kwargs)
@@ -163,10 +296,17 @@ class Reading(db.Model):
     """Model for sensor readings."""
     id = db.Column(db.Integer, primary_key=True)
     value = db.Column(db.Float, nullable=False)
-    timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    timestamp = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
     source_ip = db.Column(db.String(45), nullable=True)  # Store source IP for audit
     mode = db.Column(db.Integer, nullable=True)  # New field for the 'm' parameter (0 or 1)
 
+    # Covering index for period queries that only read timestamp and value, and an
+    # index for mode filters within a time range
+    __table_args__ = (
+        db.Index('ix_reading_ts_val', 'timestamp', 'value'),
+        db.Index('ix_reading_mode_ts', 'mode', 'timestamp'),
+    )
+
     def __repr__(self):
         return f'<Reading {self.value} (mode:{self.mode}) at {self.timestamp}>'
 
@@ -178,6 +318,102 @@ class Reading(db.Model):
             'timestamp': self.timestamp.isoformat()
         }
 
+# Columns returned by the JSON reading endpoints, matching Reading.to_dict()
+READING_COLUMNS = (Reading.id, Reading.value, Reading.mode, Reading.timestamp)
+
+def json_response(payload, status=200):
+    """Serialize a payload with orjson, which encodes datetimes natively."""
+    return app.response_class(orjson.dumps(payload), status=status, mimetype='application/json')
+
+def reading_etag(*criteria):
+    """Build an ETag from the newest id and the count of readings matching `criteria`."""
+    max_id, count = (db.session.query(func.max(Reading.id), func.count(Reading.id))
+                     .filter(*criteria)
+                     .one())
+    return f'{max_id}-{count}'
+
+def not_modified(etag):
+    """Return an empty 304 Not Modified response carrying `etag`."""
+    response = app.response_class(status=304)
+    response.set_etag(etag)
+    return response
+
+def hours_ago(hours):
+    """Return the naive UTC datetime `hours` hours before now."""
+    return datetime.utcfromtimestamp(time.time() - hours * 3600)
+
+def get_graph_rows(hours):
+    """
+    Fetch the plotted columns of the newest readings from the last `hours` hours.
+    
+    Returns lightweight (timestamp, value, mode) rows instead of Reading
+    instances, which skips ORM hydration for the graph pipeline.
+    """
+    cutoff = hours_ago(hours)
+    rows = (db.session.query(Reading.timestamp, Reading.value, Reading.mode)
+            .filter(Reading.timestamp >= cutoff)
+            .order_by(Reading.timestamp.desc())
+            .limit(MAX_GRAPH_ROWS)
+            .all())
+    if len(rows) >= MAX_GRAPH_ROWS:
+        logger.warning(f"Graph query for the last {hours} hours hit MAX_GRAPH_ROWS ({MAX_GRAPH_ROWS}); older readings are not plotted")
+    return rows
+
+def graph_version(latest_id):
+    """
+    Identify the data the graph images and page are built from.
+    
+    The period windows move with the clock, so besides the newest reading id the
+    version includes the current refresh window; graphs and the cached page then
+    age out of date at most one refresh interval after readings leave a period.
+    """
+    window = int(time.time() // max(graph_refresh_interval, 1))
+    return f'{latest_id}-{window}'
+
+def regenerate_graphs(latest_id, version):
+    """
+    Rebuild the graph images for `version`.
+    
+    Periods without readings get the "no data" image; only an empty table
+    leaves the page without graphs.
+    """
+    if latest_id is None:
+        graph_manager.clear_graphs(version)
+    else:
+        graph_manager.generate_graphs(get_graph_rows(GraphManager.MAX_HOURS), version=version)
+
+# Background graph regeneration: a single worker thread renders the graph
+# images off the request path. The queue holds at most one pending request,
+# so bursts of new readings coalesce into a single regeneration.
+graph_queue = queue.Queue(maxsize=1)
+graph_worker = None
+graph_worker_lock = Lock()
+
+def graph_worker_loop():
+    """Regenerate the graph images each time a refresh is requested."""
+    while True:
+        graph_queue.get()
+        try:
+            with app.app_context():
+                latest_id = db.session.query(func.max(Reading.id)).scalar()
+                regenerate_graphs(latest_id, graph_version(latest_id))
+        except Exception as e:
+            logger.error(f"Error regenerating graphs in background: {str(e)}")
+
+def schedule_graph_refresh():
+    """Request a background graph regeneration, starting the worker if needed."""
+    global graph_worker
+    
+    # Started lazily so each (forked) worker process gets its own thread
+    with graph_worker_lock:
+        if graph_worker is None or not graph_worker.is_alive():
+            graph_worker = threading.Thread(target=graph_worker_loop, name='graph-worker', daemon=True)
+            graph_worker.start()
+    
+    try:
+        graph_queue.put_nowait('dirty')
+    except queue.Full:
+        pass  # A regeneration is already pending and will pick up this change
 
 # API routes
 @app.route('/measure', methods=['GET'])
@@ -206,10 +442,11 @@ def add_reading():
             return jsonify({'error': 'Mode parameter (m) must be either 0 or 1'}), 400
         
         # Create new reading record with source IP and mode
+        ip_addr = request.remote_addr
         new_reading = Reading(
             value=reading_value,
             mode=mode_value,
-            source_ip=request.remote_addr
+            source_ip=ip_addr
         )
         
         # Save to database
@@ -217,11 +454,12 @@ def add_reading():
         db.session.commit()
         
         # Log the new reading
-        logger.info(f"New reading added: {reading_value} (mode:{mode_value}) from {request.remote_addr}")
+        logger.info(f"New reading added: {reading_value} (mode:{mode_value}) from {ip_addr}")
         
-        # Generate updated graphs
-        all_readings = Reading.query.all()
-        graph_manager.generate_graphs(all_readings)
+        # Regenerate graphs in the background so the response isn't delayed
+        graph_manager.mark_dirty()
+        graph_page_cache.pop('page', None)
+        schedule_graph_refresh()
         
         return jsonify({
             'message': 'Reading saved successfully',
@@ -234,6 +472,72 @@ def add_reading():
         db.session.rollback()
         return jsonify({'error': 'An error occurred while processing your request'}), 500
 
+# Route to add many readings in one request
+@app.route('/measure/bulk', methods=['POST'])
+@requires_auth
+def add_readings_bulk():
+    """
+    Add a batch of sensor readings in a single transaction.
+    
+    Expects a JSON array of objects with the same fields as /measure,
+    e.g. [{"reading": 12.5, "m": 0}, {"reading": 13.1}].
+    """
+    try:
+        items = request.get_json(silent=True)
+        if not isinstance(items, list) or not items:
+            return jsonify({'error': 'Request body must be a non-empty JSON array of readings'}), 400
+        
+        # Limit batch size to prevent resource exhaustion
+        if len(items) > MAX_BULK_READINGS:
+            return jsonify({'error': f'At most {MAX_BULK_READINGS} readings may be sent at once'}), 400
+        
+        ip_addr = request.remote_addr
+        timestamp = datetime.utcnow()
+        rows = []
+        
+        # Validate every item before inserting anything
+        for index, item in enumerate(items):
+            reading_value = item.get('reading') if isinstance(item, dict) else None
+            mode_value = item.get('m') if isinstance(item, dict) else None
+            
+            if isinstance(reading_value, bool) or not isinstance(reading_value, (int, float)):
+                return jsonify({'error': f'Item {index}: missing or invalid reading. Must be a float value.'}), 400
+            
+            if not (0.0 <= reading_value <= 50.0):
+                return jsonify({'error': f'Item {index}: reading value must be between 0.0 and 50.0'}), 400
+            
+            if mode_value is not None and (type(mode_value) is not int or mode_value not in [0, 1]):
+                return jsonify({'error': f'Item {index}: mode (m) must be either 0 or 1'}), 400
+            
+            rows.append({
+                'value': float(reading_value),
+                'mode': mode_value,
+                'timestamp': timestamp,
+                'source_ip': ip_addr
+            })
+        
+        # One round-trip and commit for the whole batch
+        db.session.bulk_insert_mappings(Reading, rows)
+        db.session.commit()
+        
+        logger.info(f"{len(rows)} readings added in bulk from {ip_addr}")
+        
+        # Regenerate graphs in the background so the response isn't delayed
+        graph_manager.mark_dirty()
+        graph_page_cache.pop('page', None)
+        schedule_graph_refresh()
+        
+        return jsonify({
+            'message': 'Readings saved successfully',
+            'count': len(rows)
+        }), 201
+        
+    except Exception as e:
+        # Log the error but don't expose details to the client
+        logger.error(f"Error adding bulk readings: {str(e)}")
+        db.session.rollback()
+        return jsonify({'error': 'An error occurred while processing your request'}), 500
+
 # Route to get all readings
 @app.route('/readings', methods=['GET'])
 @requires_auth
@@ -247,17 +551,24 @@ def get_readings():
         # Limit maximum per_page to prevent resource exhaustion
         per_page = min(per_page, 1000)
         
+        # Nothing added or removed since the client's copy
+        etag = reading_etag()
+        if request.if_none_match.contains_weak(etag):
+            return not_modified(etag)
+        
         # Query with pagination
-        readings_query = Reading.query.order_by(Reading.timestamp.desc())
+        readings_query = Reading.query.with_entities(*READING_COLUMNS).order_by(Reading.timestamp.desc())
         paginated_readings = readings_query.paginate(page=page, per_page=per_page)
         
-        return jsonify({
+        response = json_response({
             'page': page,
             'per_page': per_page,
             'total': paginated_readings.total,
             'pages': paginated_readings.pages,
-            'readings': [reading.to_dict() for reading in paginated_readings.items]
+            'readings': [row._asdict() for row in paginated_readings.items]
         })
+        response.set_etag(etag)
+        return response
     except Exception as e:
         logger.error(f"Error retrieving readings: {str(e)}")
         return jsonify({'error': 'An error occurred while retrieving readings'}), 500
@@ -268,32 +579,39 @@ def get_readings():
 def get_period_readings(period):
     """Get readings for a specific time period."""
     try:
-        # Define time periods
-        periods = {
-            'hour': 1,
-            'day': 24,
-            'week': 168,
-            'month': 720
-        }
-        
-        # Get hours for the requested period (default to day if invalid)
-        if period not in periods:
-            return jsonify({'error': f'Invalid period. Must be one of: {", ".join(periods.keys())}'}), 400
-            
-        hours = periods.get(period)
+        # Get hours for the requested period
+        hours = READING_PERIODS.get(period)
+        if hours is None:
+            return jsonify({'error': f'Invalid period. Must be one of: {READING_PERIOD_NAMES}'}), 400
         
         # Calculate the start date
-        start_date = datetime.utcnow() - timedelta(hours=hours)
+        start_date = hours_ago(hours)
         
-        # Query readings after the start date
-        readings = Reading.query.filter(Reading.timestamp >= start_date).all()
+        # Nothing entered or left the period since the client's copy
+        etag = reading_etag(Reading.timestamp >= start_date)
+        if request.if_none_match.contains_weak(etag):
+            return not_modified(etag)
         
-        return jsonify({
+        # Query the newest readings after the start date; one extra row tells
+        # whether the period holds more than MAX_ROWS readings
+        rows = (Reading.query
+                .with_entities(*READING_COLUMNS)
+                .filter(Reading.timestamp >= start_date)
+                .order_by(Reading.timestamp.desc())
+                .limit(MAX_ROWS + 1)
+                .all())
+        truncated = len(rows) > MAX_ROWS
+        readings = [row._asdict() for row in rows[:MAX_ROWS]]
+        
+        response = json_response({
             'period': period,
             'hours': hours,
             'count': len(readings),
-            'readings': [reading.to_dict() for reading in readings]
+            'truncated': truncated,
+            'readings': readings
         })
+        response.set_etag(etag)
+        return response
     except Exception as e:
         logger.error(f"Error retrieving period readings: {str(e)}")
         return jsonify({'error': 'An error occurred while retrieving readings'}), 500
@@ -303,22 +621,50 @@ def get_period_readings(period):
 def view_graphs():
     """View graphs of readings."""
     try:
-        # Get all readings and generate graphs
-        readings = Reading.query.all()
-        graphs = graph_manager.generate_graphs(readings)
+        # The newest reading id and the refresh window identify the data the page is built from
+        latest_id = db.session.query(func.max(Reading.id)).scalar()
+        version = graph_version(latest_id)
+        etag = f'graph-{version}'
         
-        # Get a recent reading for quick display
-        latest_reading = Reading.query.order_by(Reading.timestamp.desc()).first()
-        latest_value = latest_reading.value if latest_reading else None
-        latest_time = latest_reading.timestamp if latest_reading else None
+        # Nothing changed since the client's copy
+        if request.if_none_match.contains_weak(etag):
+            return not_modified(etag)
         
-        return render_template(
-            'graphs.html', 
-            graphs=graphs, 
-            latest_value=latest_value,
-            latest_time=latest_time,
-            now=datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
-        )
+        cached_version, html = graph_page_cache.get('page', (None, None))
+        if html is None or cached_version != version:
+            # Regenerate graphs only if readings arrived or the windows moved since the last render.
+            # Existing graphs are served while the background worker refreshes them;
+            # only the very first render happens inline.
+            if graph_manager.needs_refresh(version):
+                if graph_manager.graphs:
+                    schedule_graph_refresh()
+                else:
+                    regenerate_graphs(latest_id, version)
+            graphs = graph_manager.graphs
+            
+            # Get a recent reading for quick display (only the displayed columns)
+            latest_reading = (db.session.query(Reading.timestamp, Reading.value)
+                              .order_by(Reading.timestamp.desc())
+                              .first())
+            latest_value = latest_reading.value if latest_reading else None
+            latest_time = latest_reading.timestamp if latest_reading else None
+            
+            html = render_template(
+                'graphs.html', 
+                graphs=graphs, 
+                latest_value=latest_value,
+                latest_time=latest_time,
+                now=datetime.utcnow().strftime('%Y-%m-%d %H:%M:%S')
+            )
+            
+            # Only pages whose graphs match the current version are cached
+            if graph_manager.version != version:
+                return html
+            graph_page_cache['page'] = (version, html)
+        
+        response = app.response_class(html, mimetype='text/html')
+        response.set_etag(etag)
+        return response
     except Exception as e:
         logger.error(f"Error generating graphs: {str(e)}")
         return render_template('error.html', error="Could not generate graphs"), 500
@@ -329,7 +675,7 @@ def view_graphs():
 def serve_graph(filename):
     """Serve graph image files."""
     # Validate filename to prevent directory traversal
-    if not re.match(r'^[a-zA-Z0-9_\-]+\.(png|jpg|jpeg|gif)$', filename):
+    if not GRAPH_FILENAME_RE.match(filename):
         logger.warning(f"Invalid graph filename requested: {filename}")
         abort(404)
         
@@ -341,12 +687,16 @@ def serve_graph(filename):
 def home():
     """Display the homepage."""
     try:
-        # Get latest reading
-        latest_reading = Reading.query.order_by(Reading.timestamp.desc()).first()
-        
         # Get readings for the last 24 hours for an embedded graph
-        cutoff = datetime.utcnow() - timedelta(hours=24)
-        recent_readings = Reading.query.filter(Reading.timestamp >= cutoff).all()
+        recent_readings = get_graph_rows(24)
+        
+        # Rows are newest first, so the latest reading is usually already loaded
+        if recent_readings:
+            latest_reading = recent_readings[0]
+        else:
+            latest_reading = (db.session.query(Reading.timestamp, Reading.value, Reading.mode)
+                              .order_by(Reading.timestamp.desc())
+                              .first())
         
         # Generate an embedded graph
         embedded_graph = graph_manager.get_embedded_graph(recent_readings, hours=24)
@@ -6,11 +6,15 @@ Handles user authentication and permission checks
 
 import os
 import logging
-from functools import wraps
+import hmac
+from functools import wraps, lru_cache
 from flask import request, jsonify
 from dotenv import load_dotenv
 import time
+from collections import OrderedDict
+from threading import Lock
 import ipaddress
+from bisect import bisect_right
 
 # Load environment variables
 load_dotenv()
@@ -33,7 +37,7 @@ def load_users():
     
     if admin_username and admin_password:
         users[admin_username] = {
-            'password': admin_password,
+            'password': admin_password.encode('utf-8'),  # pre-encoded for compare_digest
             'role': ROLE_ADMIN
         }
     
@@ -43,7 +47,7 @@ def load_users():
     
     if viewer_username and viewer_password:
         users[viewer_username] = {
-            'password': viewer_password,
+            'password': viewer_password.encode('utf-8'),  # pre-encoded for compare_digest
             'role': ROLE_VIEWER
         }
     
@@ -55,7 +59,15 @@ USERS = load_users()
 # Rate limiting configuration
 RATE_LIMIT_WINDOW = int(os.environ.get('RATE_LIMIT_WINDOW', 60))  # seconds
 MAX_REQUESTS = int(os.environ.get('MAX_REQUESTS', 10))  # max requests per window
-request_history = {}  # IP address -> list of timestamps
+MAX_IPS = int(os.environ.get('MAX_IPS', 16384))  # max IPs tracked at once
+
+# Request history is split into shards, each guarded by its own lock, so
+# concurrent requests from different IPs rarely contend with each other.
+# Each shard maps IP address -> (tokens, last_refill) token bucket, in LRU order.
+RATE_LIMIT_SHARDS = 32  # must be a power of two
+MAX_IPS_PER_SHARD = max(1, MAX_IPS // RATE_LIMIT_SHARDS)
+REFILL_RATE = MAX_REQUESTS / RATE_LIMIT_WINDOW  # tokens regained per second
+request_history = [(Lock(), OrderedDict()) for _ in range(RATE_LIMIT_SHARDS)]
 
 # Allowed IP ranges (optional)
 allowed_ips_str = os.environ.get('ALLOWED_IPS', '')
@@ -67,39 +79,74 @@ if allowed_ips_str:
         except ValueError as e:
             logger.error(f"Invalid IP range: {ip_range} - {str(e)}")
 
+def build_ip_intervals(networks):
+    """
+    Merge networks into sorted, non-overlapping integer intervals for binary search.
+    
+    Returns a dict mapping IP version -> (starts, ends) lists.
+    """
+    intervals = {4: [], 6: []}
+    for network in sorted(networks, key=lambda n: (n.version, int(n.network_address))):
+        start, end = int(network.network_address), int(network.broadcast_address)
+        merged = intervals[network.version]
+        if merged and start <= merged[-1][1] + 1:
+            merged[-1] = (merged[-1][0], max(merged[-1][1], end))
+        else:
+            merged.append((start, end))
+    return {version: ([s for s, _ in merged], [e for _, e in merged])
+            for version, merged in intervals.items()}
+
+allowed_ip_intervals = build_ip_intervals(allowed_ip_ranges)
+
+@lru_cache(maxsize=4096)
+def parse_ip(ip_addr):
+    """Parse an IP address string, caching the result for repeat clients."""
+    return ipaddress.ip_address(ip_addr)
+
 def check_ip_allowed(ip_addr):
     """Check if an IP address is allowed based on configured ranges."""
     if not allowed_ip_ranges:
         return True  # No restrictions if no ranges defined
     
     try:
-        ip = ipaddress.ip_address(ip_addr)
-        for allowed_range in allowed_ip_ranges:
-            if ip in allowed_range:
-                return True
-        return False
+        ip = parse_ip(ip_addr)
     except ValueError:
         return False  # Invalid IP address format
+    
+    # Find the last interval starting at or below the address
+    ip_int = int(ip)
+    starts, ends = allowed_ip_intervals[ip.version]
+    i = bisect_right(starts, ip_int) - 1
+    return i >= 0 and ends[i] >= ip_int
 
 def is_rate_limited(ip_addr):
     """Check if an IP is being rate limited due to too many requests."""
-    now = time.time()
-    
-    # Initialize or clean up old requests for this IP
-    if ip_addr not in request_history:
-        request_history[ip_addr] = []
-    else:
-        # Remove timestamps older than the window
-        request_history[ip_addr] = [t for t in request_history[ip_addr] 
-                                   if now - t < RATE_LIMIT_WINDOW]
+    lock, shard = request_history[hash(ip_addr) & (RATE_LIMIT_SHARDS - 1)]
     
-    # Check if too many requests
-    if len(request_history[ip_addr]) >= MAX_REQUESTS:
-        return True
-    
-    # Record this request
-    request_history[ip_addr].append(now)
-    return False
+    with lock:
+        now = time.time()
+        
+        # New IPs start with a full bucket, otherwise mark the IP as recently used
+        bucket = shard.get(ip_addr)
+        if bucket is None:
+            tokens = MAX_REQUESTS
+        else:
+            shard.move_to_end(ip_addr)
+            
+            # Refill the tokens earned since the last request
+            tokens = min(MAX_REQUESTS, bucket[0] + (now - bucket[1]) * REFILL_RATE)
+            
+        # Check if too many requests
+        if tokens < 1:
+            return True
+        
+        # Record this request
+        shard[ip_addr] = (tokens - 1, now)
+        
+        # Evict the least recently seen IP so memory stays bounded
+        if len(shard) > MAX_IPS_PER_SHARD:
+            shard.popitem(last=False)
+        return False
 
 def authenticate_user(auth):
     """
@@ -110,45 +157,54 @@ def authenticate_user(auth):
         return False, None
     
     username = auth.username
-    password = auth.password
+    password = (auth.password or '').encode('utf-8')
     
-    if username in USERS and USERS[username]['password'] == password:
+    user = USERS.get(username)
+    if user is not None and hmac.compare_digest(password, user['password']):
         return True, {
             'username': username,
-            'role': USERS[username]['role']
+            'role': user['role']
         }
     
     return False, None
 
+def check_request(ip_addr, auth):
+    """
+    Run the IP restriction, rate limit and credential checks for a request.
+    
+    Returns (error_response, user_data); error_response is None on success.
+    """
+    # Check if IP is allowed (if restriction is enabled)
+    if allowed_ip_ranges and not check_ip_allowed(ip_addr):
+        logger.warning(f"Blocked request from unauthorized IP: {ip_addr}")
+        return (jsonify({'error': 'Access denied'}), 403), None
+    
+    # Check rate limiting
+    if is_rate_limited(ip_addr):
+        logger.warning(f"Rate limited request from IP: {ip_addr}")
+        return (jsonify({'error': 'Too many requests'}), 429), None
+    
+    # Check authentication
+    authenticated, user_data = authenticate_user(auth)
+    
+    if not authenticated:
+        # Log failed authentication attempt
+        logger.warning(f"Failed authentication attempt from {ip_addr}")
+        
+        # Return 401 Unauthorized with WWW-Authenticate header
+        return (jsonify({'error': 'Authentication required'}), 401, {
+            'WWW-Authenticate': 'Basic realm="Sensor API"'
+        }), None
+    
+    return None, user_data
+
 def requires_auth(f):
     """Decorator to require authentication for an endpoint."""
     @wraps(f)
     def decorated(*args, **kwargs):
-        # Get client IP address
-        ip_addr = request.remote_addr
-        
-        # Check if IP is allowed (if restriction is enabled)
-        if not check_ip_allowed(ip_addr):
-            logger.warning(f"Blocked request from unauthorized IP: {ip_addr}")
-            return jsonify({'error': 'Access denied'}), 403
-        
-        # Check rate limiting
-        if is_rate_limited(ip_addr):
-            logger.warning(f"Rate limited request from IP: {ip_addr}")
-            return jsonify({'error': 'Too many requests'}), 429
-            
-        # Check authentication
-        auth = request.authorization
-        authenticated, user_data = authenticate_user(auth)
-        
-        if not authenticated:
-            # Log failed authentication attempt
-            logger.warning(f"Failed authentication attempt from {ip_addr}")
-            
-            # Return 401 Unauthorized with WWW-Authenticate header
-            return jsonify({'error': 'Authentication required'}), 401, {
-                'WWW-Authenticate': 'Basic realm="Sensor API"'
-            }
+        error, user_data = check_request(request.remote_addr, request.authorization)
+        if error is not None:
+            return error
         
         # Authentication successful
         request.user_data = user_data  # Attach user data to the request
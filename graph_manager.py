@@ -5,101 +5,353 @@ Generates matplotlib-based graphs for sensor readings over different time period
 """
 
 import os
-import matplotlib.pyplot as plt
+import shutil
+import threading
+from functools import wraps
+import matplotlib.style
 import matplotlib.dates as mdates
+from matplotlib.figure import Figure
+from matplotlib.backends.backend_agg import FigureCanvasAgg
 from datetime import datetime, timedelta
 import numpy as np
 from io import BytesIO
 import base64
+import hashlib
 import logging
+import time
+from collections import OrderedDict
 
 # Set up logger
 logger = logging.getLogger('sensor_api.graph_manager')
 
+# Set up graph styling once; every figure picks it up from rcParams
+matplotlib.style.use('seaborn-v0_8-darkgrid')
+
+# Number of encoded embedded graphs kept in memory
+EMBEDDED_CACHE_SIZE = 8
+
+# Lines with more points than this are drawn without per-point markers
+MAX_MARKER_POINTS = 500
+
+# Fixed subplot margins, so saving needs no extra layout pass
+GRAPH_MARGINS = dict(left=0.08, right=0.97, bottom=0.18, top=0.92)
+
+def downsample_lttb(timestamps, values, max_points):
+    """
+    Downsample a line with Largest-Triangle-Three-Buckets, keeping its visual shape.
+    
+    Args:
+        timestamps (numpy.ndarray): Sorted datetime64 timestamps
+        values (numpy.ndarray): Values matching timestamps
+        max_points (int): Number of points to keep, or None to keep all of them
+        
+    Returns:
+        tuple: (timestamps, values) with at most max_points points
+    """
+    n = len(values)
+    if max_points is None or max_points < 3 or n <= max_points:
+        return timestamps, values
+    
+    x = timestamps.astype(np.int64).astype(np.float64)
+    
+    # The first and last points are always kept; the rest are split into
+    # max_points - 2 buckets that each contribute one point
+    edges = np.linspace(1, n - 1, max_points - 1).astype(np.intp)
+    keep = np.empty(max_points, dtype=np.intp)
+    keep[0], keep[-1] = 0, n - 1
+    
+    selected = 0
+    for i in range(max_points - 2):
+        start, end = edges[i], edges[i + 1]
+        
+        # Average point of the next bucket (just the last point for the final bucket)
+        if i + 2 < len(edges):
+            next_x = x[end:edges[i + 2]].mean()
+            next_y = values[end:edges[i + 2]].mean()
+        else:
+            next_x, next_y = x[-1], values[-1]
+        
+        # Keep the point forming the largest triangle with the previously kept
+        # point and the next bucket's average
+        areas = np.abs((x[selected] - next_x) * (values[start:end] - values[selected])
+                       - (x[selected] - x[start:end]) * (next_y - values[selected]))
+        selected = start + int(np.argmax(areas))
+        keep[i + 1] = selected
+    
+    return timestamps[keep], values[keep]
+
+def line_marker(marker, point_count):
+    """Return marker for a line of point_count points, or no marker if it has too many points."""
+    return marker if point_count <= MAX_MARKER_POINTS else ''
+
+def with_render_lock(method):
+    """Decorator that serializes a GraphManager rendering method on its render lock."""
+    @wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._render_lock:
+            return method(self, *args, **kwargs)
+    return wrapper
+
 class GraphManager:
     """Manages the generation of time-series graphs for sensor readings."""
     
-    def __init__(self, graph_dir="static/graph"):
+    # Time periods for graphs
+    TIME_PERIODS = [
+        {"name": "hourly", "title": "Last Hour", "hours": 1, "width": 10},
+        {"name": "daily", "title": "Last 24 Hours", "hours": 24, "width": 12},
+        {"name": "weekly", "title": "Last Week", "hours": 168, "width": 14},
+        {"name": "monthly", "title": "Last Month", "hours": 720, "width": 15}
+    ]
+    
+    # Oldest reading any graph period needs, in hours
+    MAX_HOURS = max(period["hours"] for period in TIME_PERIODS)
+    
+    def __init__(self, graph_dir="static/graph", refresh_interval=10):
         """
         Initialize the graph manager.
         
         Args:
             graph_dir (str): Directory where graph images will be stored
+            refresh_interval (float): Minimum number of seconds between graph regenerations
         """
         # Create directory if it doesn't exist
         self.graph_dir = graph_dir
         os.makedirs(self.graph_dir, exist_ok=True)
         
-        # Set up graph styling
-        plt.style.use('seaborn-v0_8-darkgrid')
+        # One figure is kept and cleared between period graphs, which avoids
+        # rebuilding the canvas, fonts and style for every graph. Figures are
+        # drawn directly on an Agg canvas, without pyplot's global state.
+        self._fig = Figure(figsize=(12, 6), dpi=100)
+        FigureCanvasAgg(self._fig)
+        self._fig.subplots_adjust(**GRAPH_MARGINS)
+        self._ax = self._fig.add_subplot(111)
+        
+        # Date formatters for the x-axis, shared by all graphs
+        self._fmt_hm = mdates.DateFormatter('%H:%M')
+        self._fmt_full = mdates.DateFormatter('%Y-%m-%d %H:%M')
+        self._fmt_date = mdates.DateFormatter('%Y-%m-%d')
+        
+        # Render a "no data" image per period up front, which empty periods copy
+        # instead of drawing. This also loads fonts and text rendering before the
+        # first request, and before gunicorn forks workers when preloading.
+        self._empty_graphs = {
+            period["name"]: self._create_empty_graph(period["name"], period["title"], period["width"])
+            for period in self.TIME_PERIODS
+        }
+        
+        # Regeneration state: graphs start out dirty so the first request renders them
+        self.refresh_interval = refresh_interval
+        self.graphs = []
+        self.version = None  # caller-supplied data version the graphs were built from
+        self._dirty = True
+        self._last_generated = 0.0
+        
+        # The shared figure is not thread-safe, so only one generate_graphs call
+        # runs at a time
+        self._render_lock = threading.Lock()
+        
+        # Embedded graphs as base64 strings, keyed by (hours, readings hash), in LRU order.
+        # Embedded graphs use their own figures, so they render without the render
+        # lock; only the cache itself is locked.
+        self._embedded_cache = OrderedDict()
+        self._embedded_lock = threading.Lock()
         
         logger.info(f"Graph Manager initialized with directory: {graph_dir}")
     
-    def generate_graphs(self, readings):
+    def mark_dirty(self):
+        """Flag the graphs as out of date, e.g. after a new reading was stored."""
+        self._dirty = True
+    
+    def needs_refresh(self, version=None):
+        """
+        Check whether the graphs should be regenerated.
+        
+        Args:
+            version: Current data version (e.g. the newest reading id and refresh window), if known
+        
+        Returns:
+            bool: True if the graphs are dirty or built from another version,
+                  and were not regenerated within the refresh interval
+        """
+        stale = self._dirty or version != self.version
+        return stale and time.monotonic() - self._last_generated >= self.refresh_interval
+    
+    @staticmethod
+    def _to_arrays(readings):
+        """
+        Convert readings into timestamp, value and mode arrays sorted by timestamp.
+        
+        Args:
+            readings (list): Reading objects or (timestamp, value, mode) rows
+            
+        Returns:
+            tuple: (datetime64[us] timestamps, float64 values, int8 modes with -1 for no mode)
+        """
+        timestamps = np.fromiter((r.timestamp for r in readings), dtype='datetime64[us]', count=len(readings))
+        values = np.fromiter((r.value for r in readings), dtype=np.float64, count=len(readings))
+        modes = np.fromiter((-1 if r.mode is None else r.mode for r in readings), dtype=np.int8, count=len(readings))
+        
+        # Sort by timestamp, keeping insertion order for equal timestamps
+        order = np.argsort(timestamps, kind='stable')
+        return timestamps[order], values[order], modes[order]
+    
+    @staticmethod
+    def _readings_hash(timestamps, values, modes):
+        """
+        Fingerprint sorted reading arrays cheaply.
+        
+        Uses the count, the first and last timestamps and the last value, which
+        change whenever readings are added or leave a period's window.
+        """
+        if not len(timestamps):
+            key = "empty"
+        else:
+            key = f"{len(timestamps)}|{timestamps[0]}|{timestamps[-1]}|{values[-1]!r}|{modes[-1]}"
+        return hashlib.sha1(key.encode('utf-8')).hexdigest()
+    
+    def _stored_hash(self, name):
+        """Return the readings hash recorded next to {name}.png, or None if the image is missing."""
+        if not os.path.exists(os.path.join(self.graph_dir, f"{name}.png")):
+            return None
+        try:
+            with open(os.path.join(self.graph_dir, f"{name}.hash")) as f:
+                return f.read().strip()
+        except OSError:
+            return None
+    
+    def _store_hash(self, name, readings_hash):
+        """Record the readings hash {name}.png was rendered from."""
+        with open(os.path.join(self.graph_dir, f"{name}.hash"), 'w') as f:
+            f.write(readings_hash)
+    
+    def _record_graphs(self, graphs, version):
+        """Remember the generated graphs and the data version they were built from."""
+        self.graphs = graphs
+        self.version = version
+        self._dirty = False
+        self._last_generated = time.monotonic()
+    
+    @with_render_lock
+    def clear_graphs(self, version=None):
+        """
+        Record that there are no readings at all, so no graphs are shown.
+        
+        Args:
+            version: Data version with no readings
+        """
+        self._record_graphs([], version)
+    
+    @with_render_lock
+    def generate_graphs(self, readings, version=None):
         """
         Generate graphs for different time periods.
         
         Args:
-            readings (list): List of Reading objects with timestamp and value attributes
+            readings (list): Reading objects or (timestamp, value, mode) rows
+            version: Data version the readings correspond to, recorded on success
         
         Returns:
             list: List of dictionaries with graph information
         """
         if not readings:
-            logger.warning("No readings provided to generate graphs")
-            return []
+            logger.warning("No readings provided to generate graphs; every period will show no data")
             
         try:
-            # Sort readings by timestamp
-            readings = sorted(readings, key=lambda x: x.timestamp)
-            
-            graph_files = []
-            
-            # Define time periods for graphs
-            time_periods = [
-                {"name": "hourly", "title": "Last Hour", "hours": 1, "width": 10},
-                {"name": "daily", "title": "Last 24 Hours", "hours": 24, "width": 12},
-                {"name": "weekly", "title": "Last Week", "hours": 168, "width": 14},
-                {"name": "monthly", "title": "Last Month", "hours": 720, "width": 15}
-            ]
+            # Convert readings to arrays sorted by timestamp, once for all periods
+            timestamps, values, modes = self._to_arrays(readings)
             
             current_time = datetime.utcnow()
             
-            for period in time_periods:
-                # Filter readings for current period
-                period_start = current_time - timedelta(hours=period["hours"])
-                period_readings = [r for r in readings if r.timestamp >= period_start]
-                
-                # Create the graph
-                try:
-                    fig_path = self._create_graph(
-                        period_readings, 
-                        period["name"], 
-                        period["title"],
-                        period["width"]
-                    )
-                    
-                    graph_files.append({
-                        "period": period["name"],
-                        "title": period["title"],
-                        "file": f"/graph/{period['name']}.png"  # URL path
-                    })
-                except Exception as e:
-                    logger.error(f"Error creating graph for {period['name']}: {str(e)}")
+            graph_files = []
+            for period in self.TIME_PERIODS:
+                graph = self._render_period(period, timestamps, values, modes, current_time)
+                if graph:
+                    graph_files.append(graph)
             
             logger.info(f"Generated {len(graph_files)} graphs")
+            
+            # Remember the result so requests can reuse it until the next refresh
+            self._record_graphs(graph_files, version)
             return graph_files
             
         except Exception as e:
             logger.error(f"Error in generate_graphs: {str(e)}")
             return []
         
-    def _create_graph(self, readings, name, title, width):
+    def _render_period(self, period, timestamps, values, modes, current_time):
+        """
+        Render the graph for one time period, unless the stored image is still current.
+        
+        Args:
+            period (dict): Entry of TIME_PERIODS
+            timestamps, values, modes (numpy.ndarray): All readings, sorted by timestamp
+            current_time (datetime): End of the period
+            
+        Returns:
+            dict: Graph information, or None if the graph could not be created
+        """
+        # Filter readings for the period: timestamps are sorted, so the period
+        # is the slice from the first reading at or after its start
+        period_start = np.datetime64(current_time - timedelta(hours=period["hours"]), 'us')
+        start = np.searchsorted(timestamps, period_start, side='left')
+        period_data = (timestamps[start:], values[start:], modes[start:])
+        
+        # Create the graph, unless the stored image was built from the same readings
+        try:
+            readings_hash = self._readings_hash(*period_data)
+            if self._stored_hash(period["name"]) != readings_hash:
+                self._create_graph(
+                    *period_data, 
+                    period["name"], 
+                    period["title"],
+                    period["width"]
+                )
+                self._store_hash(period["name"], readings_hash)
+            
+            return {
+                "period": period["name"],
+                "title": period["title"],
+                "file": f"/graph/{period['name']}.png"  # URL path
+            }
+        except Exception as e:
+            logger.error(f"Error creating graph for {period['name']}: {str(e)}")
+            return None
+    
+    def _create_empty_graph(self, name, title, width):
+        """
+        Render the "no data" image for a time period.
+        
+        Args:
+            name (str): Name identifier for the graph
+            title (str): Display title for the graph
+            width (int): Width of the graph in inches
+            
+        Returns:
+            str: Path to the saved image, which is not served as a graph itself
+        """
+        fig, ax = self._fig, self._ax
+        ax.clear()
+        fig.set_size_inches(width, 6)
+        
+        # Create a figure with a message
+        ax.set_title(f"Sensor Readings - {title}")
+        ax.text(0.5, 0.5, "No data available for this period", 
+                horizontalalignment='center', verticalalignment='center',
+                transform=ax.transAxes, fontsize=14)
+        
+        # Save the figure
+        file_path = os.path.join(self.graph_dir, f"{name}.empty.png")
+        fig.savefig(file_path)
+        return file_path
+    
+    def _create_graph(self, timestamps, values, modes, name, title, width):
         """
         Create a single graph for the given readings and time period.
         
         Args:
-            readings (list): List of Reading objects
+            timestamps (numpy.ndarray): Sorted datetime64 timestamps
+            values (numpy.ndarray): Reading values matching timestamps
+            modes (numpy.ndarray): Reading modes matching timestamps (-1 for no mode)
             name (str): Name identifier for the graph
             title (str): Display title for the graph
             width (int): Width of the graph in inches
@@ -107,83 +359,75 @@ class GraphManager:
         Returns:
             str: Path to the saved graph file
         """
-        # Extract timestamps and values, and separate readings by mode
-        timestamps = [r.timestamp for r in readings]
-        values = [r.value for r in readings]
-        
-        # Group readings by mode (0 or 1) - for separate visualization
-        mode0_readings = [r for r in readings if r.mode == 0]
-        mode1_readings = [r for r in readings if r.mode == 1]
-        mode_none_readings = [r for r in readings if r.mode is None]
-        
-        mode0_timestamps = [r.timestamp for r in mode0_readings]
-        mode0_values = [r.value for r in mode0_readings]
-        
-        mode1_timestamps = [r.timestamp for r in mode1_readings]
-        mode1_values = [r.value for r in mode1_readings]
-        
-        # Set up the figure with better DPI for sharper images
-        plt.figure(figsize=(width, 6), dpi=100)
-        
-        # If no readings for this period, create an empty graph
-        if not timestamps:
-            # Create a figure with a message
-            plt.title(f"Sensor Readings - {title}")
-            plt.text(0.5, 0.5, "No data available for this period", 
-                    horizontalalignment='center', verticalalignment='center',
-                    transform=plt.gca().transAxes, fontsize=14)
-            plt.tight_layout()
-            
-            # Save the figure
-            file_path = os.path.join(self.graph_dir, f"{name}.png")
-            plt.savefig(file_path)
-            plt.close()
+        file_path = os.path.join(self.graph_dir, f"{name}.png")
+        
+        # If no readings for this period, use the pre-rendered empty graph
+        if not len(timestamps):
+            shutil.copyfile(self._empty_graphs[name], file_path)
             return file_path
         
+        # Separate readings by mode for separate visualization
+        mode0 = modes == 0
+        mode1 = modes == 1
+        mode_none = modes == -1
+        
+        # Reuse the shared figure: clear the previous period's axes
+        fig, ax = self._fig, self._ax
+        ax.clear()
+        fig.set_size_inches(width, 6)
+        
+        # With many more readings than horizontal pixels, each mode's line is drawn
+        # from a downsampled copy; the trend line and statistics use every reading
+        max_points = int(width * fig.dpi)
+        if len(values) <= 4 * max_points:
+            max_points = None
+        
         # Plot mode 0 readings in blue
-        if mode0_readings:
-            plt.plot(mode0_timestamps, mode0_values, '-o', color='#2196F3', markersize=4, 
+        if mode0.any():
+            line_x, line_y = downsample_lttb(timestamps[mode0], values[mode0], max_points)
+            ax.plot(line_x, line_y, '-', marker=line_marker('o', len(line_y)), color='#2196F3', markersize=4, 
                     linewidth=1.5, markerfacecolor='white', markeredgewidth=1, label='Mode 0')
                     
         # Plot mode 1 readings in green
-        if mode1_readings:
-            plt.plot(mode1_timestamps, mode1_values, '-s', color='#4CAF50', markersize=4, 
+        if mode1.any():
+            line_x, line_y = downsample_lttb(timestamps[mode1], values[mode1], max_points)
+            ax.plot(line_x, line_y, '-', marker=line_marker('s', len(line_y)), color='#4CAF50', markersize=4, 
                     linewidth=1.5, markerfacecolor='white', markeredgewidth=1, label='Mode 1')
         
         # Plot readings with no mode specified in gray (for backward compatibility)
-        if mode_none_readings:
-            none_timestamps = [r.timestamp for r in mode_none_readings]
-            none_values = [r.value for r in mode_none_readings]
-            plt.plot(none_timestamps, none_values, '-^', color='#9E9E9E', markersize=4, 
+        if mode_none.any():
+            line_x, line_y = downsample_lttb(timestamps[mode_none], values[mode_none], max_points)
+            ax.plot(line_x, line_y, '-', marker=line_marker('^', len(line_y)), color='#9E9E9E', markersize=4, 
                     linewidth=1.5, markerfacecolor='white', markeredgewidth=1, label='No Mode')
         
         # Add trend line (if enough data points)
         if len(values) > 2:
             try:
-                # Convert timestamps to numeric format for linear regression
-                numeric_dates = mdates.date2num(timestamps)
+                # Convert timestamps to days since the Unix epoch (the same values as
+                # mdates.date2num with the default epoch) in one vectorized step
+                numeric_dates = timestamps.astype(np.int64) * (1e-6 / 86400.0)
                 
                 # Fit a linear trend line
                 z = np.polyfit(numeric_dates, values, 1)
                 p = np.poly1d(z)
                 
-                # Plot trend line
-                plt.plot(timestamps, p(numeric_dates), "r--", linewidth=1, 
+                # Plot trend line; it is straight, so its two end points are enough
+                ends = [0, -1]
+                ax.plot(timestamps[ends], p(numeric_dates[ends]), "r--", linewidth=1, 
                         alpha=0.7, label=f"Trend: {z[0]:.2e}x + {z[1]:.2f}")
                 
             except Exception as e:
                 logger.warning(f"Could not generate trend line: {str(e)}")
                 
-        # Add legend if we have different modes plotted
-        if mode0_readings or mode1_readings or mode_none_readings:
-            plt.legend(loc='upper left', fontsize=9)
+        # Add legend for the plotted modes
+        ax.legend(loc='upper left', fontsize=9)
         
         # Add statistics as a box
-        if values:
-            avg_value = sum(values) / len(values)
-            min_value = min(values)
-            max_value = max(values)
-            current_value = values[-1] if values else 0
+        if len(values):
+            avg_value = values.mean()
+            min_value = values.min()
+            max_value = values.max()
+            current_value = values[-1]
             
             stats_text = (
                 f"Current: {current_value:.2f}\n"
@@ -192,41 +436,37 @@ class GraphManager:
                 f"Max: {max_value:.2f}"
             )
             
-            # Add statistics text with better styling
-            plt.figtext(0.02, 0.02, stats_text, 
-                      bbox=dict(facecolor='white', alpha=0.8, 
-                                boxstyle='round,pad=0.5', edgecolor='#cccccc'))
+            # Add statistics text with better styling, in the lower left of the axes
+            ax.text(0.02, 0.04, stats_text, transform=ax.transAxes,
+                    bbox=dict(facecolor='white', alpha=0.8, 
+                              boxstyle='round,pad=0.5', edgecolor='#cccccc'))
         
         # Format the plot
-        plt.title(f"Sensor Readings - {title}", fontsize=14, pad=10)
-        plt.ylabel("Reading Value", fontsize=12)
-        plt.grid(True, linestyle='--', alpha=0.7)
+        ax.set_title(f"Sensor Readings - {title}", fontsize=14, pad=10)
+        ax.set_ylabel("Reading Value", fontsize=12)
+        ax.grid(True, linestyle='--', alpha=0.7)
         
         # Format the x-axis to show dates properly
-        plt.gcf().autofmt_xdate()
+        fig.autofmt_xdate(bottom=GRAPH_MARGINS['bottom'])
         
         # Choose appropriate date format based on time period
         if "Hour" in title:
-            date_format = mdates.DateFormatter('%H:%M')
+            date_format = self._fmt_hm
         elif "24 Hours" in title:
-            date_format = mdates.DateFormatter('%H:%M')
+            date_format = self._fmt_hm
         else:
-            date_format = mdates.DateFormatter('%Y-%m-%d %H:%M')
+            date_format = self._fmt_full
             
-        plt.gca().xaxis.set_major_formatter(date_format)
+        ax.xaxis.set_major_formatter(date_format)
         
         # Add margin to y-axis
-        if values:
-            y_min, y_max = plt.ylim()
+        if len(values):
+            y_min, y_max = ax.get_ylim()
             y_margin = (y_max - y_min) * 0.1  # 10% margin
-            plt.ylim(y_min - y_margin, y_max + y_margin)
-        
-        plt.tight_layout()
+            ax.set_ylim(y_min - y_margin, y_max + y_margin)
         
         # Save the figure with improved quality
-        file_path = os.path.join(self.graph_dir, f"{name}.png")
-        plt.savefig(file_path, dpi=100, bbox_inches='tight')
-        plt.close()
+        fig.savefig(file_path, dpi=100)
         
         return file_path
         
@@ -235,7 +475,7 @@ class GraphManager:
         Generate a base64-encoded graph for embedding in HTML.
         
         Args:
-            readings (list): List of Reading objects
+            readings (list): Reading objects or (timestamp, value, mode) rows
             hours (int): Number of hours to include in the graph
             
         Returns:
@@ -246,61 +486,68 @@ class GraphManager:
             return ""
             
         try:
-            # Sort readings by timestamp
-            readings = sorted(readings, key=lambda x: x.timestamp)
+            # Convert readings to arrays sorted by timestamp
+            timestamps, values_arr, modes = self._to_arrays(readings)
             
             # Filter readings for the requested time period
-            period_start = datetime.utcnow() - timedelta(hours=hours)
-            period_readings = [r for r in readings if r.timestamp >= period_start]
+            period_start = np.datetime64(datetime.utcnow() - timedelta(hours=hours), 'us')
+            start = np.searchsorted(timestamps, period_start, side='left')
+            timestamps, values_arr, modes = timestamps[start:], values_arr[start:], modes[start:]
+            
+            # Reuse the encoded image if it was built from the same readings
+            cache_key = (hours, self._readings_hash(timestamps, values_arr, modes))
+            with self._embedded_lock:
+                if cache_key in self._embedded_cache:
+                    self._embedded_cache.move_to_end(cache_key)
+                    return self._embedded_cache[cache_key]
             
             # Group readings by mode
-            mode0_readings = [r for r in period_readings if r.mode == 0]
-            mode1_readings = [r for r in period_readings if r.mode == 1]
-            mode_none_readings = [r for r in period_readings if r.mode is None]
+            mode0 = modes == 0
+            mode1 = modes == 1
+            mode_none = modes == -1
+            mode0_vals = values_arr[mode0]
+            mode1_vals = values_arr[mode1]
+            none_vals = values_arr[mode_none]
             
             # Create the figure with improved styling
-            plt.figure(figsize=(10, 5), dpi=100)
-            plt.style.use('seaborn-v0_8-darkgrid')
+            fig = Figure(figsize=(10, 5), dpi=100)
+            FigureCanvasAgg(fig)
+            fig.subplots_adjust(**GRAPH_MARGINS)
+            ax = fig.add_subplot(111)
             
-            if not period_readings:
-                plt.text(0.5, 0.5, "No data available for this period", 
+            if not len(timestamps):
+                ax.text(0.5, 0.5, "No data available for this period", 
                         horizontalalignment='center', verticalalignment='center',
-                        transform=plt.gca().transAxes, fontsize=14)
+                        transform=ax.transAxes, fontsize=14)
             else:
                 # Plot mode 0 readings in blue
-                if mode0_readings:
-                    mode0_timestamps = [r.timestamp for r in mode0_readings]
-                    mode0_values = [r.value for r in mode0_readings]
-                    plt.plot(mode0_timestamps, mode0_values, '-o', color='#2196F3', markersize=4, 
+                if mode0_vals.size:
+                    ax.plot(timestamps[mode0], mode0_vals, '-', marker=line_marker('o', mode0_vals.size), color='#2196F3', markersize=4, 
                             linewidth=1.5, markerfacecolor='white', markeredgewidth=1, label='Mode 0')
                     
                 # Plot mode 1 readings in green
-                if mode1_readings:
-                    mode1_timestamps = [r.timestamp for r in mode1_readings]
-                    mode1_values = [r.value for r in mode1_readings]
-                    plt.plot(mode1_timestamps, mode1_values, '-s', color='#4CAF50', markersize=4, 
+                if mode1_vals.size:
+                    ax.plot(timestamps[mode1], mode1_vals, '-', marker=line_marker('s', mode1_vals.size), color='#4CAF50', markersize=4, 
                             linewidth=1.5, markerfacecolor='white', markeredgewidth=1, label='Mode 1')
                 
                 # Plot readings with no mode specified in gray
-                if mode_none_readings:
-                    none_timestamps = [r.timestamp for r in mode_none_readings]
-                    none_values = [r.value for r in mode_none_readings]
-                    plt.plot(none_timestamps, none_values, '-^', color='#9E9E9E', markersize=4, 
+                if none_vals.size:
+                    ax.plot(timestamps[mode_none], none_vals, '-', marker=line_marker('^', none_vals.size), color='#9E9E9E', markersize=4, 
                             linewidth=1.5, markerfacecolor='white', markeredgewidth=1, label='No Mode')
                 
-                plt.gcf().autofmt_xdate()
-                plt.grid(True, linestyle='--', alpha=0.7)
+                fig.autofmt_xdate(bottom=GRAPH_MARGINS['bottom'])
+                ax.grid(True, linestyle='--', alpha=0.7)
                 
                 # Add legend if we have different modes
-                if (mode0_readings and mode1_readings) or mode_none_readings:
-                    plt.legend(loc='upper left', fontsize=9)
+                if (mode0_vals.size and mode1_vals.size) or none_vals.size:
+                    ax.legend(loc='upper left', fontsize=9)
                 
                 # Add statistics
-                if values:
-                    avg_value = sum(values) / len(values)
-                    min_value = min(values)
-                    max_value = max(values)
-                    current_value = values[-1] if values else 0
+                if values_arr.size:
+                    avg_value = values_arr.mean()
+                    min_value = values_arr.min()
+                    max_value = values_arr.max()
+                    current_value = values_arr[-1]
                     
                     stats_text = (
                         f"Current: {current_value:.2f}\n"
@@ -309,35 +556,38 @@ class GraphManager:
                         f"Max: {max_value:.2f}"
                     )
                     
-                    plt.figtext(0.02, 0.02, stats_text, 
-                             bbox=dict(facecolor='white', alpha=0.8, 
-                                     boxstyle='round,pad=0.5', edgecolor='#cccccc'))
+                    ax.text(0.02, 0.04, stats_text, transform=ax.transAxes,
+                            bbox=dict(facecolor='white', alpha=0.8, 
+                                    boxstyle='round,pad=0.5', edgecolor='#cccccc'))
             
             # Format the plot
-            plt.title(f"Sensor Readings - Last {hours} Hours", fontsize=14, pad=10)
-            plt.ylabel("Reading Value", fontsize=12)
+            ax.set_title(f"Sensor Readings - Last {hours} Hours", fontsize=14, pad=10)
+            ax.set_ylabel("Reading Value", fontsize=12)
             
             # Choose appropriate date format
             if hours <= 24:
-                date_format = mdates.DateFormatter('%H:%M')
+                date_format = self._fmt_hm
             else:
-                date_format = mdates.DateFormatter('%Y-%m-%d')
+                date_format = self._fmt_date
                 
-            plt.gca().xaxis.set_major_formatter(date_format)
-            
-            plt.tight_layout()
+            ax.xaxis.set_major_formatter(date_format)
             
             # Save to a BytesIO object
-            buffer = BytesIO()
-            plt.savefig(buffer, format='png', dpi=100, bbox_inches='tight')
-            plt.close()
+            with BytesIO() as buffer:
+                fig.savefig(buffer, format='png', dpi=100)
+                
+                # Encode straight from a view of the buffer, without copying the PNG bytes out;
+                # base64 output is pure ASCII
+                with buffer.getbuffer() as image_png:
+                    embedded_graph = base64.b64encode(image_png).decode('ascii')
             
-            # Get the buffer content and encode as base64
-            buffer.seek(0)
-            image_png = buffer.getvalue()
-            buffer.close()
+            # Remember the result, evicting the least recently used entry
+            with self._embedded_lock:
+                self._embedded_cache[cache_key] = embedded_graph
+                if len(self._embedded_cache) > EMBEDDED_CACHE_SIZE:
+                    self._embedded_cache.popitem(last=False)
             
-            return base64.b64encode(image_png).decode('utf-8')
+            return embedded_graph
             
         except Exception as e:
             logger.error(f"Error generating embedded graph: {str(e)}")
@@ -2,15 +2,19 @@ import multiprocessing
 
 bind="0.0.0.0:5001"
 
-workers = multiprocessing.cpu_count() * 2 + 1
+workers = multiprocessing.cpu_count()
 
-worker_class = "sync"
+worker_class = "gthread"
+threads = 4
 
 timeout = 30
 
+# Import the app (and warm up matplotlib) once in the master before forking workers
+preload_app = True
+
 graceful_timeout = 30
 
-max_requests = 100
+max_requests = 1000
 max_requests_jitter = 20
 
 errorlog = "logs/gunicorn-error.log"
@@ -1,12 +1,12 @@
 """
 Database Schema Migration Script for Sensor API
 ----------------------------------------------
-Adds the new 'mode' column to the Reading table
+Adds the new 'mode' column and the timestamp and mode indexes to the Reading table
 """
 
 import os
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, Column, Integer, MetaData, Table
+from sqlalchemy import create_engine, Column, Integer, MetaData, Table, Index, text
 
 # Load environment variables from .env file
 load_dotenv()
@@ -20,9 +20,8 @@ db_name = os.environ.get('DB_NAME', 'readings_db')
 # Create database URL
 db_url = f'mysql+pymysql://{db_username}:{db_password}@{db_host}/{db_name}'
 
-# Create engine and connect to the database
+# Create engine for the database
 engine = create_engine(db_url)
-connection = engine.connect()
 
 # Set up metadata for reflection
 metadata = MetaData()
@@ -36,25 +35,44 @@ if 'reading' in metadata.tables:
     if 'mode' not in reading_table.columns:
         print("Adding 'mode' column to Reading table...")
         
-        # Begin a transaction
-        trans = connection.begin()
-        
         try:
-            # Execute the ALTER TABLE statement
-            connection.execute('ALTER TABLE reading ADD COLUMN mode INTEGER NULL')
+            # Execute the ALTER TABLE statement; the transaction is committed
+            # on success and rolled back if it raises
+            with engine.begin() as connection:
+                connection.execute(text('ALTER TABLE reading ADD COLUMN mode INTEGER NULL'))
             
-            # Commit the transaction
-            trans.commit()
             print("Migration successful! Added 'mode' column to Reading table.")
         except Exception as e:
-            # Roll back the transaction if there was an error
-            trans.rollback()
             print(f"Error during migration: {str(e)}")
     else:
         print("The 'mode' column already exists in the Reading table.")
+    
+    # Reload the table so a newly added 'mode' column can be indexed
+    reading_table = Table('reading', MetaData(), autoload_with=engine)
+    
+    # Indexes for the timestamp-filtered and timestamp-sorted queries, and for
+    # queries that filter on mode within a time range
+    existing_indexes = {index.name for index in reading_table.indexes}
+    new_indexes = [
+        Index('ix_reading_timestamp', reading_table.c.timestamp),
+        Index('ix_reading_ts_val', reading_table.c.timestamp, reading_table.c.value),
+        Index('ix_reading_mode_ts', reading_table.c.mode, reading_table.c.timestamp)
+    ]
+    
+    for index in new_indexes:
+        if index.name in existing_indexes:
+            print(f"The '{index.name}' index already exists on the Reading table.")
+            continue
+        
+        print(f"Creating '{index.name}' index on Reading table...")
+        try:
+            index.create(bind=engine)
+            print(f"Migration successful! Created '{index.name}' index.")
+        except Exception as e:
+            print(f"Error during migration: {str(e)}")
 else:
     print("The Reading table does not exist. Run the application first to create it.")
 
-# Close the connection
-connection.close()
+# Close the engine's connections
+engine.dispose()
 print("Migration script completed.")
@@ -10,8 +10,9 @@ import sys
 import argparse
 from datetime import datetime, timedelta
 import csv
+from itertools import islice
 import sqlalchemy
-from sqlalchemy import create_engine, Column, Integer, Float, DateTime, String
+from sqlalchemy import create_engine, Column, Integer, Float, DateTime, String, Index
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from dotenv import load_dotenv
@@ -23,6 +24,9 @@ load_dotenv()
 # Set up SQLAlchemy
 Base = declarative_base()
 
+# Number of CSV rows inserted per bulk insert during import
+IMPORT_BATCH_SIZE = 5000
+
 # Define Reading model (must match app.py model)
 class Reading(Base):
     """Model for sensor readings."""
@@ -30,10 +34,15 @@ class Reading(Base):
     
     id = Column(Integer, primary_key=True)
     value = Column(Float, nullable=False)
-    timestamp = Column(DateTime, nullable=False, default=datetime.utcnow)
+    timestamp = Column(DateTime, nullable=False, default=datetime.utcnow, index=True)
     source_ip = Column(String(45), nullable=True)
     mode = Column(Integer, nullable=True)  # 0 or 1
 
+    __table_args__ = (
+        Index('ix_reading_ts_val', 'timestamp', 'value'),
+        Index('ix_reading_mode_ts', 'mode', 'timestamp'),
+    )
+
     def __repr__(self):
         return f"<Reading {self.value} (mode:{self.mode}) at {self.timestamp}>"
     
@@ -134,8 +143,8 @@ def list_readings(args):
     session = connect_to_database()
     
     try:
-        # Build query
-        query = session.query(Reading)
+        # Build query; only the displayed columns are selected, as plain tuples
+        query = session.query(Reading.id, Reading.value, Reading.mode, Reading.timestamp, Reading.source_ip)
         
         # Apply filters
         if args.days:
@@ -155,27 +164,78 @@ def list_readings(args):
         if args.limit:
             query = query.limit(args.limit)
             
-        # Execute query
-        readings = query.all()
+        # Stream results from the database in batches and display them as they arrive
+        readings_found = 0
+        for reading in query.yield_per(500):
+            if readings_found == 0:
+                print("-" * 80)
+                print(f"{'ID':>5} | {'Value':>8} | {'Mode':>4} | {'Timestamp':>25} | Source")
+                print("-" * 80)
+            
+            print(f"{reading.id:5d} | {reading.value:8.2f} | {reading.mode if reading.mode is not None else 'N/A':>4} | {reading.timestamp.isoformat():25} | {reading.source_ip}")
+            readings_found += 1
         
-        # Display results
-        if not readings:
+        if not readings_found:
             print("No readings found.")
             return
-            
-        print(f"Found {len(readings)} readings:")
-        print("-" * 80)
-        print(f"{'ID':>5} | {'Value':>8} | {'Mode':>4} | {'Timestamp':>25} | Source")
-        print("-" * 80)
         
-        for reading in readings:
-            print(f"{reading.id:5d} | {reading.value:8.2f} | {reading.mode if reading.mode is not None else 'N/A':>4} | {reading.timestamp.isoformat():25} | {reading.source_ip}")
+        print("-" * 80)
+        print(f"Found {readings_found} readings.")
         
     except Exception as e:
         print(f"Error listing readings: {str(e)}")
     finally:
         session.close()
 
+def parse_csv_timestamp(row, timestamp_idx):
+    """Return a CSV row's timestamp, or the current time if it has none or it is invalid."""
+    timestamp = datetime.utcnow()
+    if timestamp_idx is not None and timestamp_idx < len(row) and row[timestamp_idx]:
+        try:
+            timestamp = datetime.fromisoformat(row[timestamp_idx])
+        except ValueError:
+            print(f"Warning: Invalid timestamp format in row. Using current time.")
+    return timestamp
+
+def validate_csv_rows(rows, value_idx, mode_idx, timestamp_idx, source_ip):
+    """Validate CSV rows one at a time, reporting why each rejected row was skipped."""
+    readings = []
+    skipped = 0
+    
+    for row in rows:
+        try:
+            # Extract and validate value
+            value = float(row[value_idx])
+            if not (0.0 <= value <= 50.0):
+                print(f"Skipping row: value {value} not in range 0.0-50.0")
+                skipped += 1
+                continue
+            
+            # Extract mode if present
+            mode = None
+            if mode_idx is not None and mode_idx < len(row) and row[mode_idx]:
+                mode = int(row[mode_idx])
+                if mode not in [0, 1]:
+                    print(f"Skipping row: mode {mode} not 0 or 1")
+                    skipped += 1
+                    continue
+            
+            # Extract timestamp if present
+            timestamp = parse_csv_timestamp(row, timestamp_idx)
+            
+            readings.append({
+                'value': value,
+                'mode': mode,
+                'timestamp': timestamp,
+                'source_ip': source_ip
+            })
+            
+        except Exception as e:
+            print(f"Error processing row: {str(e)}")
+            skipped += 1
+    
+    return readings, skipped
+
 def import_csv(args):
     """Import readings from a CSV file."""
     # Connect to the database
@@ -191,58 +251,36 @@ def import_csv(args):
         readings_added = 0
         readings_skipped = 0
         
-        with open(args.file, 'r') as f:
-            reader = csv.DictReader(f)
+        with open(args.file, 'r', newline='') as f:
+            # Blank lines come through as empty rows; skip them like DictReader does
+            reader = (row for row in csv.reader(f) if row)
+            fieldnames = next(reader, [])
             
             # Validate CSV structure
             required_fields = ['value']
             for field in required_fields:
-                if field not in reader.fieldnames:
+                if field not in fieldnames:
                     print(f"Error: CSV file must contain '{field}' column.")
                     return
             
-            # Process rows
-            for row in reader:
-                try:
-                    # Extract and validate value
-                    value = float(row['value'])
-                    if not (0.0 <= value <= 50.0):
-                        print(f"Skipping row: value {value} not in range 0.0-50.0")
-                        readings_skipped += 1
-                        continue
-                    
-                    # Extract mode if present
-                    mode = None
-                    if 'mode' in row and row['mode']:
-                        mode = int(row['mode'])
-                        if mode not in [0, 1]:
-                            print(f"Skipping row: mode {mode} not 0 or 1")
-                            readings_skipped += 1
-                            continue
-                    
-                    # Extract timestamp if present
-                    timestamp = datetime.utcnow()
-                    if 'timestamp' in row and row['timestamp']:
-                        try:
-                            timestamp = datetime.fromisoformat(row['timestamp'])
-                        except ValueError:
-                            print(f"Warning: Invalid timestamp format in row. Using current time.")
-                    
-                    # Create reading
-                    new_reading = Reading(
-                        value=value,
-                        mode=mode,
-                        timestamp=timestamp,
-                        source_ip=f'CSV Import ({args.file})'
-                    )
-                    
-                    # Add to database
-                    session.add(new_reading)
-                    readings_added += 1
-                    
-                except Exception as e:
-                    print(f"Error processing row: {str(e)}")
-                    readings_skipped += 1
+            # Column positions, so rows can be read as plain lists
+            value_idx = fieldnames.index('value')
+            mode_idx = fieldnames.index('mode') if 'mode' in fieldnames else None
+            timestamp_idx = fieldnames.index('timestamp') if 'timestamp' in fieldnames else None
+            source_ip = f'CSV Import ({args.file})'
+            
+            # Validate and insert the file one batch of rows at a time
+            while True:
+                rows = list(islice(reader, IMPORT_BATCH_SIZE))
+                if not rows:
+                    break
+                
+                pending, skipped = validate_csv_rows(rows, value_idx, mode_idx, timestamp_idx, source_ip)
+                readings_added += len(pending)
+                readings_skipped += skipped
+                
+                if pending:
+                    session.bulk_insert_mappings(Reading, pending)
             
             # Commit all readings at once
             session.commit()